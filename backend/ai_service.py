@@ -1,12 +1,13 @@
 import json
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from langchain.schema import HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
 from typing import List as TypeList
+from output_parser import OutputParsingError, extract_json, parse_model_sections
 
 # Pydantic models for structured output
 class QuizQuestion(BaseModel):
@@ -36,8 +37,11 @@ class AIService:
         )
         self.parser = PydanticOutputParser(pydantic_object=TopicContent)
     
-    def generate_topic_content(self, topic: str, difficulty_level: str = 'beginner') -> Dict[str, Any]:
-        """Generate comprehensive learning content for a topic"""
+    def generate_topic_content(self, topic: str, difficulty_level: str = 'beginner') -> Tuple[Dict[str, Any], List[str]]:
+        """Generate comprehensive learning content for a topic.
+        
+        Returns the content and the names of sections filled with placeholders.
+        """
         
         prompt_template = ChatPromptTemplate.from_messages([
             ("system", "You are an expert educational content creator. Provide clear, engaging, and accurate learning materials."),
@@ -56,24 +60,34 @@ class AIService:
         ])
         
         try:
-            chain = prompt_template | self.llm | self.parser
+            chain = prompt_template | self.llm
             result = chain.invoke({
                 "topic": topic,
                 "difficulty_level": difficulty_level,
                 "format_instructions": self.parser.get_format_instructions()
             })
             
-            # Convert Pydantic model to dict
-            return result.model_dump()
+            # Keep every valid section instead of discarding the whole response
+            return parse_model_sections(
+                result.content,
+                TopicContent,
+                fallback=self._get_fallback_content(topic, difficulty_level)
+            )
             
         except Exception as e:
             print(f"Error generating content: {e}")
-            return self._get_fallback_content(topic, difficulty_level)
+            return self._get_fallback_content(topic, difficulty_level), list(TopicContent.model_fields)
     
-    def generate_adaptive_quiz(self, topic: str, user_level: str, previous_performance: float) -> Dict[str, Any]:
-        """Generate adaptive quiz based on user performance"""
+    def generate_adaptive_quiz(self, topic: str, user_level: str, previous_performance: Optional[float],
+                               learner_state: Dict[str, Any] = None) -> Tuple[Dict[str, Any], List[str]]:
+        """Generate adaptive quiz based on user performance.
+        
+        ``previous_performance`` is None when the user has no quiz attempts yet.
+        Returns the quiz, including the chosen difficulty, and the names of
+        sections filled with placeholders.
+        """
         
-        difficulty_adjustment = self._calculate_difficulty_adjustment(previous_performance)
+        difficulty_adjustment = self._calculate_difficulty_adjustment(previous_performance, learner_state)
         
         # Create parser for adaptive quiz
         adaptive_parser = PydanticOutputParser(pydantic_object=AdaptiveQuiz)
@@ -83,7 +97,7 @@ class AIService:
             ("human", """
             Create a {difficulty_adjustment} difficulty quiz for the topic: "{topic}" 
             User's current level: {user_level}
-            Previous performance: {previous_performance}%
+            Previous performance: {previous_performance}
             
             Generate 3 questions that are appropriate for this level and performance.
             Make sure the questions are challenging but achievable.
@@ -93,20 +107,29 @@ class AIService:
         ])
         
         try:
-            chain = prompt_template | self.llm | adaptive_parser
+            chain = prompt_template | self.llm
             result = chain.invoke({
                 "topic": topic,
                 "user_level": user_level,
-                "previous_performance": previous_performance,
+                "previous_performance": (
+                    f"{previous_performance:.0f}%" if previous_performance is not None else "no quiz attempts yet"
+                ),
                 "difficulty_adjustment": difficulty_adjustment,
                 "format_instructions": adaptive_parser.get_format_instructions()
             })
             
-            return result.model_dump()
+            quiz, fallback_sections = parse_model_sections(
+                result.content,
+                AdaptiveQuiz,
+                fallback=self._get_fallback_quiz(topic)
+            )
             
         except Exception as e:
             print(f"Error generating quiz: {e}")
-            return self._get_fallback_quiz(topic)
+            quiz, fallback_sections = self._get_fallback_quiz(topic), list(AdaptiveQuiz.model_fields)
+        
+        quiz['difficulty'] = difficulty_adjustment
+        return quiz, fallback_sections
     
     def generate_learning_recommendations(self, user_topics: List[str], user_performance: Dict[str, float]) -> List[str]:
         """Generate personalized learning recommendations"""
@@ -138,12 +161,14 @@ class AIService:
             
             # Parse the response to extract the JSON array
             content = result.content
-            # Extract JSON array from the response
-            import re
-            json_match = re.search(r'\[.*\]', content)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
+            try:
+                topics = extract_json(content, expect=list)
+                topics = [topic.strip() for topic in topics if isinstance(topic, str) and topic.strip()]
+                if topics:
+                    return topics[:5]
+                # An empty or non-string array has nothing to offer; use the defaults
+                return self._get_fallback_recommendations()
+            except OutputParsingError:
                 # Fallback: split by commas and clean up
                 topics = [topic.strip().strip('"[]') for topic in content.split(',')]
                 return topics[:5]  # Return first 5 topics
@@ -152,8 +177,26 @@ class AIService:
             print(f"Error generating recommendations: {e}")
             return self._get_fallback_recommendations()
     
-    def _calculate_difficulty_adjustment(self, performance: float) -> str:
+    def _calculate_difficulty_adjustment(self, performance: Optional[float], learner_state: Dict[str, Any] = None) -> str:
         """Calculate appropriate difficulty based on performance"""
+        if learner_state is not None:
+            # No quiz history yet: start in the middle rather than at "easy"
+            if not learner_state.get('attempts'):
+                return "medium"
+            performance = self._estimate_mastery(learner_state)
+            if performance >= 90:
+                return "very hard"
+            elif performance >= 75:
+                return "hard"
+            elif performance >= 55:
+                return "medium"
+            elif performance >= 35:
+                return "easy"
+            else:
+                return "very easy"
+        
+        if performance is None:
+            return "medium"
         if performance >= 80:
             return "hard"
         elif performance >= 60:
@@ -161,6 +204,24 @@ class AIService:
         else:
             return "easy"
     
+    def _estimate_mastery(self, learner_state: Dict[str, Any], neutral: float = 60.0) -> float:
+        """Blend rolling score, trend, attempt count and recency into a 0-100 estimate"""
+        # Few attempts or a long break pull the estimate back towards neutral
+        attempts = learner_state['attempts']
+        confidence = attempts / (attempts + 2.0)
+        weight = confidence * learner_state.get('recency_weight', 1.0)
+        
+        estimate = neutral + (learner_state['score_mean'] - neutral) * weight
+        estimate += learner_state.get('score_trend', 0.0) * weight
+        return max(0.0, min(100.0, estimate))
+    
+    def is_fallback_content(self, content: Dict[str, Any], topic: str, difficulty_level: str) -> bool:
+        """Check whether stored content contains any placeholder section"""
+        fallback = self._get_fallback_content(topic, difficulty_level)
+        # The placeholder duration is also a plausible real value, so it is not a signal
+        fallback.pop('estimated_duration', None)
+        return any(content.get(name) == value for name, value in fallback.items())
+    
     def _get_fallback_content(self, topic: str, difficulty_level: str) -> Dict[str, Any]:
         """Fallback content when AI generation fails"""
         return {
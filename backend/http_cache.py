@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Optional
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024  # bytes; smaller bodies are not worth compressing
+ENCODINGS = ('br', 'gzip')
+
+
+class SerializedBody:
+    """A JSON response body serialized once, with compressed variants built on demand"""
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+        self._encoded = {}
+
+    @classmethod
+    def from_payload(cls, payload: Any, etag: Optional[str] = None) -> 'SerializedBody':
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return cls(body, etag or hashlib.sha1(body).hexdigest())
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            if encoding == 'br':
+                self._encoded[encoding] = brotli.compress(self.body)
+            else:
+                self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+        return self._encoded[encoding]
+
+
+class ResponseCache:
+    """Bounded LRU of serialized bodies, keyed by anything that changes with the data"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key) -> Optional[SerializedBody]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body: SerializedBody) -> SerializedBody:
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+
+def make_etag(*parts) -> str:
+    return hashlib.sha1('-'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def not_modified(etag: str, cache_control: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds any encoding of this version"""
+    for encoding in (None,) + ENCODINGS:
+        representation = _representation_etag(etag, encoding)
+        if request.if_none_match.contains_weak(representation):
+            response = Response(status=304)
+            _set_cache_headers(response, representation, cache_control)
+            return response
+    return None
+
+
+def json_response(body: SerializedBody, cache_control: str) -> Response:
+    """Serve a serialized body with ETag, Cache-Control and compression applied"""
+    response = not_modified(body.etag, cache_control)
+    if response is not None:
+        return response
+
+    encoding = _choose_encoding(len(body.body))
+    response = Response(body.encoded(encoding), status=200, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    _set_cache_headers(response, _representation_etag(body.etag, encoding), cache_control)
+    return response
+
+
+def _choose_encoding(size: int) -> Optional[str]:
+    if size < COMPRESS_MIN_SIZE:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _representation_etag(etag: str, encoding: Optional[str]) -> str:
+    # Strong ETags must differ between encodings of the same resource
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def _set_cache_headers(response: Response, etag: str, cache_control: str) -> None:
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
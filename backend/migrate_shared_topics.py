@@ -0,0 +1,135 @@
+"""Move per-user topic content and quizzes into shared canonical topics.
+
+Run from the backend directory after upgrading:
+
+    python migrate_shared_topics.py
+
+The ALTER TABLE statements use MySQL syntax (MODIFY, combined ADD
+clauses), matching the database configured in app.py; other databases
+need the equivalent statements applied by hand.
+
+Every run adds any missing columns. Deduplication runs only on the first
+run, when the canonical_topic table is created, or when --deduplicate is
+passed. It commits once at the end, so a run that fails partway leaves
+no topics deduplicated; the next run reports that and asks for
+--deduplicate, because the canonical_topic table already exists.
+
+The oldest copy of each topic (by normalized title and difficulty) becomes
+the shared canonical topic; newer duplicates are pointed at it and their
+own content and quizzes are removed. Topics a user has customized
+are never shared. Progress records keep pointing at the user's
+enrollment, so no progress is lost.
+"""
+from sqlalchemy import inspect, text
+from app import app, db
+from models import CanonicalTopic, Topic
+from routes import ai_service
+import json
+import sys
+
+
+def add_missing_columns():
+    # db.create_all() creates new tables but never alters existing ones
+    inspector = inspect(db.engine)
+    topic_columns = {column['name'] for column in inspector.get_columns('topic')}
+    quiz_columns = {column['name'] for column in inspector.get_columns('quiz')}
+
+    statements = []
+    if 'version' not in topic_columns:
+        statements.append('ALTER TABLE topic ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    if 'quizzes_customized' not in topic_columns:
+        statements.append('ALTER TABLE topic ADD COLUMN quizzes_customized BOOLEAN NOT NULL DEFAULT FALSE')
+    if 'canonical_topic_id' not in topic_columns:
+        statements.append(
+            'ALTER TABLE topic ADD COLUMN canonical_topic_id INTEGER NULL, '
+            'ADD FOREIGN KEY (canonical_topic_id) REFERENCES canonical_topic (id)'
+        )
+    if 'canonical_topic_id' not in quiz_columns:
+        statements.append(
+            'ALTER TABLE quiz ADD COLUMN canonical_topic_id INTEGER NULL, '
+            'ADD FOREIGN KEY (canonical_topic_id) REFERENCES canonical_topic (id)'
+        )
+        statements.append('ALTER TABLE quiz MODIFY topic_id INTEGER NULL')
+    if 'adaptive_topic_id' not in quiz_columns:
+        statements.append(
+            'ALTER TABLE quiz ADD COLUMN adaptive_topic_id INTEGER NULL, '
+            'ADD FOREIGN KEY (adaptive_topic_id) REFERENCES topic (id)'
+        )
+
+    with db.engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+def is_shareable(topic):
+    try:
+        content = json.loads(topic.content)
+    except ValueError:
+        return False
+    return not ai_service.is_fallback_content(content, topic.title, topic.difficulty_level)
+
+
+def pending_topics():
+    """Unshared topics whose content was generated and never customized"""
+    # Customization bumps the version, so version 1 means generated content only
+    topics = Topic.query.filter(
+        Topic.canonical_topic_id.is_(None),
+        Topic.content.isnot(None),
+        Topic.version == 1,
+        Topic.quizzes_customized.is_(False)
+    ).order_by(Topic.created_at, Topic.id).all()
+    return [topic for topic in topics if is_shareable(topic)]
+
+
+def deduplicate_topics():
+    canonical_by_key = {
+        (canonical.title_key, canonical.difficulty_level): canonical
+        for canonical in CanonicalTopic.query.all()
+    }
+    created = deduplicated = 0
+    for topic in pending_topics():
+        key = (CanonicalTopic.make_key(topic.title), topic.difficulty_level)
+        canonical = canonical_by_key.get(key)
+        quizzes = list(topic.quizzes)
+        topic.quizzes = []
+
+        if canonical is None:
+            canonical = CanonicalTopic(
+                title=topic.title,
+                title_key=key[0],
+                content=topic.content,
+                difficulty_level=topic.difficulty_level,
+                created_at=topic.created_at
+            )
+            canonical.quizzes.extend(quizzes)
+            db.session.add(canonical)
+            canonical_by_key[key] = canonical
+            created += 1
+        else:
+            for quiz in quizzes:
+                db.session.delete(quiz)
+            deduplicated += 1
+
+        topic.content = None
+        topic.canonical_topic = canonical
+
+    db.session.commit()
+    return created, deduplicated
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        first_run = not inspect(db.engine).has_table('canonical_topic')
+        db.create_all()
+        add_missing_columns()
+        if first_run or '--deduplicate' in sys.argv[1:]:
+            created, deduplicated = deduplicate_topics()
+            print(f"Created {created} shared topics, deduplicated {deduplicated} topics")
+        else:
+            pending = len(pending_topics())
+            if pending:
+                print(f"Skipped deduplication, but {pending} unshared generated topics remain. "
+                      "This usually means an earlier run was interrupted during deduplication; "
+                      "re-run with --deduplicate to finish it")
+            else:
+                print("Columns up to date; no topics left to deduplicate")
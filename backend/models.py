@@ -1,4 +1,5 @@
 from app import db
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -20,18 +21,72 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+class CanonicalTopic(db.Model):
+    """AI-generated content and quizzes shared by every user enrolled in a topic"""
+    __table_args__ = (db.UniqueConstraint('title_key', 'difficulty_level', name='uq_canonical_topic_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    title_key = db.Column(db.String(200), nullable=False)  # normalized title for lookup
+    content = db.Column(db.Text)  # AI-generated content
+    difficulty_level = db.Column(db.String(20), default='beginner')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    quizzes = db.relationship('Quiz', backref='canonical_topic', lazy=True)
+    enrollments = db.relationship('Topic', backref='canonical_topic', lazy=True)
+    
+    @staticmethod
+    def make_key(title):
+        return ' '.join(title.lower().split())[:200]
+
 class Topic(db.Model):
+    """A user's enrollment in a topic; content and quizzes are copied on write"""
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    content = db.Column(db.Text)  # AI-generated content
+    content = db.Column(db.Text)  # per-user override of the canonical content
     difficulty_level = db.Column(db.String(20), default='beginner')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    canonical_topic_id = db.Column(db.Integer, db.ForeignKey('canonical_topic.id'))
+    version = db.Column(db.Integer, default=1, nullable=False)  # bumped on every customization
+    quizzes_customized = db.Column(db.Boolean, default=False, nullable=False)  # quizzes overridden, even if emptied
     
     # Relationships
-    quizzes = db.relationship('Quiz', backref='topic', lazy=True)
+    quizzes = db.relationship('Quiz', backref='topic', lazy=True, foreign_keys='Quiz.topic_id')  # per-user override quizzes
+    adaptive_quizzes = db.relationship('Quiz', lazy=True, foreign_keys='Quiz.adaptive_topic_id')  # latest adaptive quiz
     progress_records = db.relationship('ProgressRecord', backref='topic', lazy=True)
+    
+    def resolved_content(self):
+        if self.content is not None or not self.canonical_topic:
+            return self.content
+        return self.canonical_topic.content
+    
+    def resolved_quizzes(self):
+        if self.quizzes_customized or not self.canonical_topic:
+            return self.quizzes
+        return self.canonical_topic.quizzes
+    
+    def customize(self, content=None, quizzes=None):
+        """Store per-user overrides; the shared canonical rows are never modified"""
+        if self.id is not None:
+            # Incremented in SQL so concurrent customizations get distinct versions,
+            # which the topic ETag and response cache key rely on
+            self.version = type(self).version + 1
+        if content is not None:
+            self.content = content
+        if quizzes is not None:
+            for quiz in list(self.quizzes):
+                db.session.delete(quiz)
+            self.quizzes = quizzes
+            self.quizzes_customized = True
+    
+    def replace_adaptive_quizzes(self, quizzes):
+        """Keep only the latest adaptive quiz; the topic's own quiz set is untouched"""
+        for quiz in list(self.adaptive_quizzes):
+            db.session.delete(quiz)
+        self.adaptive_quizzes = quizzes
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -40,7 +95,9 @@ class Quiz(db.Model):
     options = db.Column(db.Text)  # JSON string of answer options
     explanation = db.Column(db.Text)
     difficulty = db.Column(db.String(20), default='medium')
-    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False)
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'))  # set for per-user override quizzes
+    adaptive_topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'))  # set for adaptive quizzes
+    canonical_topic_id = db.Column(db.Integer, db.ForeignKey('canonical_topic.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class ProgressRecord(db.Model):
@@ -73,4 +130,71 @@ class LearningSession(db.Model):
     
     def end_session(self):
         self.end_time = datetime.utcnow()
-        self.duration = int((self.end_time - self.start_time).total_seconds() / 60) 
\ No newline at end of file
+        self.duration = int((self.end_time - self.start_time).total_seconds() / 60) 
+
+class LearnerState(db.Model):
+    """Rolling per-user, per-topic learning signals, updated incrementally"""
+    SCORE_ALPHA = 0.3  # weight of the newest quiz score in the rolling mean
+    TREND_ALPHA = 0.3
+    RECENCY_HALF_LIFE_DAYS = 14.0
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'topic_id', name='uq_learner_state_user_topic'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False)
+    score_mean = db.Column(db.Float, default=0.0)  # exponentially weighted quiz score
+    score_trend = db.Column(db.Float, default=0.0)  # weighted change per attempt
+    last_score = db.Column(db.Float, default=0.0)
+    attempts = db.Column(db.Integer, default=0)
+    sessions = db.Column(db.Integer, default=0)
+    time_spent = db.Column(db.Integer, default=0)  # in minutes
+    last_activity = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def get_or_create(cls, user_id, topic_id):
+        state = cls.query.filter_by(user_id=user_id, topic_id=topic_id).first()
+        if not state:
+            state = cls(user_id=user_id, topic_id=topic_id, score_mean=0.0, score_trend=0.0,
+                        last_score=0.0, attempts=0, sessions=0, time_spent=0)
+            try:
+                # Savepoint, so a lost race does not discard the caller's other changes
+                with db.session.begin_nested():
+                    db.session.add(state)
+            except IntegrityError:
+                # A concurrent request may have created the row first. Use a locking read,
+                # as a plain one may not see rows committed after this transaction began
+                state = cls.query.filter_by(user_id=user_id, topic_id=topic_id).with_for_update().first()
+                if state is None:
+                    # Not a lost race, e.g. a foreign key failure
+                    raise
+        return state
+
+    def record_quiz(self, score):
+        if self.attempts:
+            previous_mean = self.score_mean
+            self.score_mean += self.SCORE_ALPHA * (score - previous_mean)
+            self.score_trend += self.TREND_ALPHA * ((self.score_mean - previous_mean) - self.score_trend)
+        else:
+            self.score_mean = score
+        self.last_score = score
+        self.attempts += 1
+        self.last_activity = datetime.utcnow()
+
+    def record_session(self, duration):
+        self.sessions += 1
+        self.time_spent += duration or 0
+        self.last_activity = datetime.utcnow()
+
+    def to_vector(self):
+        """Current state, with recency decay applied at read time"""
+        days_idle = (datetime.utcnow() - self.last_activity).total_seconds() / 86400
+        return {
+            'score_mean': self.score_mean,
+            'score_trend': self.score_trend,
+            'last_score': self.last_score,
+            'attempts': self.attempts,
+            'sessions': self.sessions,
+            'time_spent': self.time_spent,
+            'recency_weight': 0.5 ** (max(days_idle, 0) / self.RECENCY_HALF_LIFE_DAYS)
+        }
@@ -0,0 +1,257 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type, get_args, get_origin
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# Fenced block, tolerating a missing closing fence on truncated output. Fences
+# must start a line: newlines inside JSON strings are escaped, so backticks in
+# a string value (common in programming content) never look like a fence
+_FENCE_RE = re.compile(r'^```[A-Za-z]*[ \t]*\n(.*?)(?:^```|\Z)', re.S | re.M)
+_STRING_BODY_RE = re.compile(r'(?:[^"\\]|\\.)*', re.S)
+_SCALAR_RE = re.compile(r'[^\s,:\[\]{}"]+')
+_PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+_CLOSERS = {'{': '}', '[': ']'}
+_MAX_OPENERS_TRIED = 32  # per candidate; bounds the work on bracket-heavy prose
+
+
+class OutputParsingError(ValueError):
+    """Raised when no usable JSON can be recovered from an LLM response"""
+
+
+def extract_json(text: str, expect: Optional[type] = None) -> Any:
+    """Extract a JSON object or array from noisy LLM output.
+
+    Handles markdown fences, surrounding prose, trailing commas, Python
+    literals and responses truncated mid-document. ``expect`` may be
+    ``dict`` or ``list`` to pick the first value of that kind.
+    """
+    for value in _iter_json_values(text, expect):
+        return value
+
+    raise OutputParsingError("No parsable JSON found in response")
+
+
+def parse_model_sections(text: str, model: Type[BaseModel],
+                         fallback: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """Validate an LLM response against ``model`` one section at a time.
+
+    Valid sections are kept as-is; invalid items inside list sections are
+    dropped individually. Sections that cannot be recovered are taken from
+    ``fallback`` and their names returned alongside the result. Raises
+    ``OutputParsingError`` if nothing usable remains.
+    """
+    error = OutputParsingError("No parsable JSON found in response")
+    # A value that parses may still be the wrong one, e.g. a dict literal
+    # inside a code sample; keep looking until one has usable sections
+    for data in _iter_json_values(text, dict):
+        try:
+            return _model_sections(data, model, fallback)
+        except OutputParsingError as e:
+            error = e
+
+    raise error
+
+
+def _model_sections(data: Any, model: Type[BaseModel],
+                    fallback: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[str]]:
+    if not isinstance(data, dict):
+        raise OutputParsingError(f"Expected a JSON object for {model.__name__}")
+
+    result = {}
+    fallback_sections = []
+    recovered = 0
+    for name, field in model.model_fields.items():
+        if name in data:
+            try:
+                result[name] = _validate_section(name, field.annotation, data[name])
+                recovered += 1
+                continue
+            except (ValidationError, OutputParsingError) as e:
+                print(f"Invalid section '{name}' in {model.__name__}: {e}")
+
+        if fallback is not None and name in fallback:
+            result[name] = fallback[name]
+            fallback_sections.append(name)
+        elif not field.is_required():
+            result[name] = field.get_default(call_default_factory=True)
+        else:
+            raise OutputParsingError(f"Missing section '{name}' in {model.__name__}")
+
+    if not recovered:
+        raise OutputParsingError(f"No valid sections in {model.__name__}")
+
+    return result, fallback_sections
+
+
+def _iter_json_values(text: str, expect: Optional[type] = None):
+    """Yield every JSON value recoverable from ``text``, most likely first"""
+    if not text:
+        raise OutputParsingError("Empty response")
+
+    openers = {dict: '{', list: '['}.get(expect, '{[')
+    decoder = json.JSONDecoder(strict=False)
+
+    # Fast path: the whole response is well-formed JSON, possibly after prose
+    for start in _opener_positions(text, openers):
+        try:
+            yield decoder.raw_decode(text, start)[0]
+        except ValueError:
+            pass
+        break
+
+    for candidate in _candidates(text):
+        # Brackets in surrounding prose fail to parse; move on to the next one
+        for start in _opener_positions(candidate, openers):
+            try:
+                yield decoder.raw_decode(candidate, start)[0]
+                continue
+            except ValueError:
+                pass
+
+            repaired = _repair(candidate, start)
+            if repaired is None:
+                continue
+            try:
+                yield json.loads(repaired, strict=False)
+            except ValueError:
+                continue
+
+
+def _candidates(text: str):
+    """Yield fenced blocks first, then the raw text"""
+    for match in _FENCE_RE.finditer(text):
+        yield match.group(1)
+    yield text
+
+
+def _opener_positions(text: str, openers: str):
+    matches = re.finditer('[' + re.escape(openers) + ']', text)
+    for _, match in zip(range(_MAX_OPENERS_TRIED), matches):
+        yield match.start()
+
+
+def _repair(text: str, start: int) -> Optional[str]:
+    """Re-emit the JSON value starting at ``start``, fixing common defects.
+
+    Walks the tokens once, dropping trailing commas and remembering the
+    last point at which the document could be cleanly closed. If the text
+    ends before the outermost container does, values that were cut off are
+    discarded rather than closed: a truncated list item is dropped whole,
+    otherwise the text is cut back to the last complete value.
+    """
+    pieces = []
+    stack = []  # [opener, expecting, start] with expecting in key/colon/value/comma
+    safe_point = None
+    pos, end = start, len(text)
+
+    def value_done():
+        nonlocal safe_point
+        if stack:
+            stack[-1][1] = 'comma'
+        safe_point = (len(pieces), [frame[0] for frame in stack])
+
+    while pos < end:
+        ch = text[pos]
+
+        if ch in ' \t\r\n':
+            pos += 1
+        elif ch == '"':
+            body = _STRING_BODY_RE.match(text, pos + 1)
+            is_key = bool(stack) and stack[-1][0] == '{' and stack[-1][1] == 'key'
+            if body.end() >= end or text[body.end()] != '"':
+                # Truncated inside a string
+                break
+            pieces.append(text[pos:body.end() + 1])
+            pos = body.end() + 1
+            if is_key:
+                stack[-1][1] = 'colon'
+            else:
+                value_done()
+        elif ch in '{[':
+            stack.append([ch, 'key' if ch == '{' else 'value', len(pieces)])
+            pieces.append(ch)
+            pos += 1
+            safe_point = (len(pieces), [frame[0] for frame in stack])
+        elif ch in '}]':
+            pos += 1
+            if not stack:
+                break
+            if pieces and pieces[-1] == ',':
+                pieces.pop()
+            pieces.append(_CLOSERS[stack.pop()[0]])
+            value_done()
+            if not stack:
+                return ''.join(pieces)
+        elif ch == ':':
+            pieces.append(ch)
+            if stack:
+                stack[-1][1] = 'value'
+            pos += 1
+        elif ch == ',':
+            if pieces and pieces[-1] != ',':
+                pieces.append(ch)
+            if stack:
+                stack[-1][1] = 'key' if stack[-1][0] == '{' else 'value'
+            pos += 1
+        else:
+            token = _SCALAR_RE.match(text, pos)
+            if token is None or token.end() >= end:
+                # Scalar cut off at end of text
+                break
+            pieces.append(_PYTHON_LITERALS.get(token.group(), token.group()))
+            pos = token.end()
+            value_done()
+
+    if safe_point is None:
+        return None
+
+    length, open_containers = safe_point
+    # An unfinished container inside a list is a partial item, e.g. a quiz
+    # missing its answer; drop the outermost such item entirely
+    for depth in range(1, len(stack)):
+        if stack[depth - 1][0] == '[':
+            length = stack[depth][2]
+            open_containers = [frame[0] for frame in stack[:depth]]
+            break
+
+    del pieces[length:]
+    while pieces and pieces[-1] == ',':
+        pieces.pop()
+    pieces.extend(_CLOSERS[opener] for opener in reversed(open_containers))
+    return ''.join(pieces)
+
+
+def _validate_section(name: str, annotation: Any, value: Any) -> Any:
+    if get_origin(annotation) is list:
+        if not isinstance(value, list):
+            raise OutputParsingError(f"Expected a list for '{name}'")
+        (item_type,) = get_args(annotation) or (Any,)
+        items = []
+        for item in value:
+            try:
+                items.append(_validate_value(item_type, item))
+            except ValidationError:
+                continue
+        if not items:
+            raise OutputParsingError(f"No valid items in '{name}'")
+        if len(items) < len(value):
+            print(f"Dropped {len(value) - len(items)} invalid item(s) from '{name}'")
+        return items
+
+    return _validate_value(annotation, value)
+
+
+def _validate_value(annotation: Any, value: Any) -> Any:
+    # LLMs often emit numbers where the schema asks for strings
+    if annotation is str and isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    validated = _adapter(annotation).validate_python(value)
+    if isinstance(validated, BaseModel):
+        return validated.model_dump()
+    return validated
+
+
+@lru_cache(maxsize=None)
+def _adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(annotation)
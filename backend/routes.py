@@ -1,12 +1,73 @@
 from flask import request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app import app, db
-from models import User, Topic, Quiz, ProgressRecord, LearningSession
+from models import User, CanonicalTopic, Topic, Quiz, ProgressRecord, LearningSession, LearnerState
 from ai_service import AIService
+from http_cache import ResponseCache, SerializedBody, json_response, make_etag, not_modified
+from sqlalchemy.exc import IntegrityError
 import json
 from datetime import datetime, timedelta
 
 ai_service = AIService()
+topic_response_cache = ResponseCache()
+
+# Topic content only changes through customization, which bumps Topic.version,
+# so clients may reuse it after a cheap ETag revalidation
+TOPIC_CACHE_CONTROL = 'private, no-cache'
+PROGRESS_CACHE_CONTROL = 'private, no-cache'
+
+def _build_quizzes(quizzes_data, difficulty='medium'):
+    return [
+        Quiz(
+            question=quiz_data['question'],
+            correct_answer=quiz_data['correct_answer'],
+            options=json.dumps(quiz_data['options']),
+            explanation=quiz_data['explanation'],
+            difficulty=difficulty
+        )
+        for quiz_data in quizzes_data
+    ]
+
+def _serialize_quiz(quiz):
+    return {
+        'id': quiz.id,
+        'question': quiz.question,
+        'options': json.loads(quiz.options) if quiz.options else [],
+        'correct_answer': quiz.correct_answer,
+        'explanation': quiz.explanation,
+        'difficulty': quiz.difficulty
+    }
+
+def _get_or_create_canonical_topic(title, difficulty_level):
+    """Return (canonical topic, content), generating content only on first request"""
+    title_key = CanonicalTopic.make_key(title)
+    canonical = CanonicalTopic.query.filter_by(title_key=title_key, difficulty_level=difficulty_level).first()
+    if canonical:
+        return canonical, json.loads(canonical.content) if canonical.content else {}
+    
+    ai_content, fallback_sections = ai_service.generate_topic_content(topic=title, difficulty_level=difficulty_level)
+    
+    # Content with any placeholder section is not shared so the topic is generated again next time
+    if fallback_sections:
+        return None, ai_content
+    
+    canonical = CanonicalTopic(
+        title=title,
+        title_key=title_key,
+        content=json.dumps(ai_content),
+        difficulty_level=difficulty_level,
+        quizzes=_build_quizzes(ai_content.get('quizzes', []))
+    )
+    db.session.add(canonical)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request generated the same topic first; use theirs
+        db.session.rollback()
+        canonical = CanonicalTopic.query.filter_by(title_key=title_key, difficulty_level=difficulty_level).first()
+        ai_content = json.loads(canonical.content) if canonical.content else {}
+    
+    return canonical, ai_content
 
 # Authentication routes
 @app.route('/api/auth/register', methods=['POST'])
@@ -82,36 +143,26 @@ def create_topic():
     if not data or not data.get('title'):
         return jsonify({'error': 'Topic title is required'}), 400
     
-    # Generate AI content for the topic
+    difficulty_level = data.get('difficulty_level', 'beginner')
+    
+    # Reuse shared AI content for the topic, generating it if nobody has yet
     try:
-        ai_content = ai_service.generate_topic_content(
-            topic=data['title'],
-            difficulty_level=data.get('difficulty_level', 'beginner')
-        )
+        canonical, ai_content = _get_or_create_canonical_topic(data['title'], difficulty_level)
         
-        # Create topic
+        # Create the user's enrollment in the topic
         topic = Topic(
             title=data['title'],
             description=data.get('description', ''),
-            content=json.dumps(ai_content),
-            difficulty_level=data.get('difficulty_level', 'beginner'),
-            user_id=current_user_id
+            difficulty_level=difficulty_level,
+            user_id=current_user_id,
+            canonical_topic_id=canonical.id if canonical else None
         )
+        if not canonical:
+            topic.customize(content=json.dumps(ai_content), quizzes=_build_quizzes(ai_content.get('quizzes', [])))
         
         db.session.add(topic)
         db.session.commit()
         
-        # Create quizzes from AI content
-        for quiz_data in ai_content.get('quizzes', []):
-            quiz = Quiz(
-                question=quiz_data['question'],
-                correct_answer=quiz_data['correct_answer'],
-                options=json.dumps(quiz_data['options']),
-                explanation=quiz_data['explanation'],
-                topic_id=topic.id
-            )
-            db.session.add(quiz)
-        
         # Create initial progress record
         progress = ProgressRecord(
             user_id=current_user_id,
@@ -162,7 +213,7 @@ def get_user_topics():
             } if progress else None
         })
     
-    return jsonify({'topics': topics_data}), 200
+    return json_response(SerializedBody.from_payload({'topics': topics_data}), PROGRESS_CACHE_CONTROL)
 
 @app.route('/api/topics/<int:topic_id>', methods=['GET'])
 @jwt_required()
@@ -174,23 +225,25 @@ def get_topic(topic_id):
     if not topic:
         return jsonify({'error': 'Topic not found'}), 404
     
-    # Parse AI-generated content
-    content = json.loads(topic.content) if topic.content else {}
+    # The ETag is known from the topic row alone, before any content is loaded
+    etag = make_etag('topic', topic.id, topic.version, topic.canonical_topic_id)
+    response = not_modified(etag, TOPIC_CACHE_CONTROL)
+    if response is not None:
+        return response
+    
+    cached = topic_response_cache.get(etag)
+    if cached is not None:
+        return json_response(cached, TOPIC_CACHE_CONTROL)
+    
+    # Parse AI-generated content, shared unless the user customized it
+    resolved_content = topic.resolved_content()
+    content = json.loads(resolved_content) if resolved_content else {}
     
     # Get quizzes
-    quizzes = Quiz.query.filter_by(topic_id=topic.id).all()
-    quiz_data = []
-    for quiz in quizzes:
-        quiz_data.append({
-            'id': quiz.id,
-            'question': quiz.question,
-            'options': json.loads(quiz.options) if quiz.options else [],
-            'correct_answer': quiz.correct_answer,
-            'explanation': quiz.explanation,
-            'difficulty': quiz.difficulty
-        })
+    quizzes = topic.resolved_quizzes()
+    quiz_data = [_serialize_quiz(quiz) for quiz in quizzes]
     
-    return jsonify({
+    body = SerializedBody.from_payload({
         'topic': {
             'id': topic.id,
             'title': topic.title,
@@ -200,7 +253,47 @@ def get_topic(topic_id):
             'difficulty_level': topic.difficulty_level,
             'created_at': topic.created_at.isoformat()
         }
-    }), 200
+    }, etag=etag)
+    
+    return json_response(topic_response_cache.put(etag, body), TOPIC_CACHE_CONTROL)
+
+@app.route('/api/topics/<int:topic_id>', methods=['PUT'])
+@jwt_required()
+def update_topic(topic_id):
+    current_user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No changes provided'}), 400
+    
+    topic = Topic.query.filter_by(id=topic_id, user_id=current_user_id).first()
+    
+    if not topic:
+        return jsonify({'error': 'Topic not found'}), 404
+    
+    if 'title' in data:
+        topic.title = data['title']
+    if 'description' in data:
+        topic.description = data['description']
+    
+    content = None
+    quizzes = None
+    try:
+        if 'content' in data:
+            # Copy on write: apply the changes to this user's copy of the content
+            resolved_content = topic.resolved_content()
+            content = json.loads(resolved_content) if resolved_content else {}
+            content.update(data['content'])
+            content = json.dumps(content)
+        if 'quizzes' in data:
+            quizzes = _build_quizzes(data['quizzes'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Invalid content or quizzes'}), 400
+    
+    topic.customize(content=content, quizzes=quizzes)
+    db.session.commit()
+    
+    return jsonify({'message': 'Topic updated successfully'}), 200
 
 # Quiz routes
 @app.route('/api/quiz/submit', methods=['POST'])
@@ -220,7 +313,12 @@ def submit_quiz():
     if not topic:
         return jsonify({'error': 'Topic not found'}), 404
     
-    quizzes = Quiz.query.filter_by(topic_id=topic_id).all()
+    # Answers to the latest adaptive quiz are graded against that set alone
+    adaptive_ids = {str(quiz.id) for quiz in topic.adaptive_quizzes}
+    if adaptive_ids and set(answers) <= adaptive_ids:
+        quizzes = topic.adaptive_quizzes
+    else:
+        quizzes = topic.resolved_quizzes()
     
     # Calculate score
     correct_answers = 0
@@ -261,6 +359,9 @@ def submit_quiz():
         )
         db.session.add(progress)
     
+    if total_questions > 0:
+        LearnerState.get_or_create(current_user_id, topic_id).record_quiz(score_percentage)
+    
     db.session.commit()
     
     return jsonify({
@@ -271,6 +372,49 @@ def submit_quiz():
         'results': results
     }), 200
 
+@app.route('/api/quiz/adaptive/<int:topic_id>', methods=['POST'])
+@jwt_required()
+def create_adaptive_quiz(topic_id):
+    current_user_id = get_jwt_identity()
+    
+    topic = Topic.query.filter_by(id=topic_id, user_id=current_user_id).first()
+    if not topic:
+        return jsonify({'error': 'Topic not found'}), 404
+    
+    user = User.query.get(current_user_id)
+    state = LearnerState.query.filter_by(user_id=current_user_id, topic_id=topic_id).first()
+    learner_state = state.to_vector() if state else {}
+    
+    try:
+        quiz, fallback_sections = ai_service.generate_adaptive_quiz(
+            topic=topic.title,
+            user_level=user.learning_level if user else topic.difficulty_level,
+            previous_performance=learner_state['score_mean'] if learner_state.get('attempts') else None,
+            learner_state=learner_state
+        )
+        
+        # Placeholder questions would be graded like real ones, so they are never saved
+        if 'questions' in fallback_sections:
+            return jsonify({'error': 'Error generating quiz'}), 500
+        
+        # Saved as the user's adaptive set so submit_quiz grades them and updates LearnerState
+        quizzes = _build_quizzes(quiz['questions'], difficulty=quiz['difficulty'])
+        topic.replace_adaptive_quizzes(quizzes)
+        db.session.commit()
+        
+        return jsonify({
+            'quiz': {
+                'topic_id': topic.id,
+                'difficulty': quiz['difficulty'],
+                'estimated_time': quiz['estimated_time'],
+                'questions': [_serialize_quiz(q) for q in quizzes]
+            },
+            'learner_state': learner_state
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': f'Error generating quiz: {str(e)}'}), 500
+
 # Progress routes
 @app.route('/api/progress/<int:user_id>', methods=['GET'])
 @jwt_required()
@@ -296,7 +440,7 @@ def get_user_progress(user_id):
                 'last_accessed': record.last_accessed.isoformat()
             })
     
-    return jsonify({'progress': progress_data}), 200
+    return json_response(SerializedBody.from_payload({'progress': progress_data}), PROGRESS_CACHE_CONTROL)
 
 @app.route('/api/progress/update', methods=['POST'])
 @jwt_required()
@@ -407,8 +551,12 @@ def end_session():
     if not session:
         return jsonify({'error': 'Session not found'}), 404
     
+    if session.end_time:
+        return jsonify({'error': 'Session already ended'}), 400
+    
     session.end_session()
     session.activities_completed = data.get('activities_completed', 0)
+    LearnerState.get_or_create(current_user_id, session.topic_id).record_session(session.duration)
     
     db.session.commit()
     
@@ -0,0 +1,43 @@
+"""Time the output parser over the recorded LLM outputs in corpus/.
+
+Run from the backend directory: python tests/benchmark_output_parser.py [iterations]
+"""
+import os
+import sys
+import timeit
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import TopicContent
+from output_parser import OutputParsingError, extract_json, parse_model_sections
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+
+def run(name, text, iterations):
+    def parse():
+        try:
+            parse_model_sections(text, TopicContent)
+        except OutputParsingError:
+            pass
+
+    def extract():
+        try:
+            extract_json(text)
+        except OutputParsingError:
+            pass
+
+    # The parser logs dropped items; keep that out of the timings and the table
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        extract_us = timeit.timeit(extract, number=iterations) / iterations * 1e6
+        parse_us = timeit.timeit(parse, number=iterations) / iterations * 1e6
+    print(f"{name:<32} {len(text):>7} {extract_us:>12.1f} {parse_us:>13.1f}")
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"{'corpus file':<32} {'bytes':>7} {'extract (us)':>12} {'sections (us)':>12}")
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+            run(name, f.read(), iterations)
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Backend modules are imported as top-level modules, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never point the tests at a real database, even if DATABASE_URL is exported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+# app must be imported before models: it registers the routes, which import models
+import app  # noqa: E402,F401
@@ -0,0 +1,115 @@
+import gzip
+import json
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+import http_cache
+import routes
+from app import app, db
+from http_cache import COMPRESS_MIN_SIZE, SerializedBody, json_response, not_modified
+
+LARGE = {'text': 'x' * (COMPRESS_MIN_SIZE * 2)}
+SMALL = {'text': 'x'}
+
+
+def serve(payload, headers=None):
+    with app.test_request_context(headers=headers or {}):
+        return json_response(SerializedBody.from_payload(payload, etag='v1'), 'private, no-cache')
+
+
+def test_large_body_is_gzipped_with_its_own_etag():
+    response = serve(LARGE, {'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.get_etag() == ('v1-gzip', False)
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Accept-Encoding' in response.vary
+    assert json.loads(gzip.decompress(response.get_data())) == LARGE
+
+
+@pytest.mark.skipif(http_cache.brotli is None, reason="brotli not installed")
+def test_brotli_is_preferred_when_accepted():
+    response = serve(LARGE, {'Accept-Encoding': 'gzip, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.get_etag() == ('v1-br', False)
+    assert json.loads(http_cache.brotli.decompress(response.get_data())) == LARGE
+
+
+def test_gzip_is_used_when_brotli_is_unavailable(monkeypatch):
+    monkeypatch.setattr(http_cache, 'brotli', None)
+
+    assert serve(LARGE, {'Accept-Encoding': 'gzip, br'}).headers['Content-Encoding'] == 'gzip'
+
+
+@pytest.mark.parametrize('accept_encoding', ['gzip;q=0', 'br;q=0, gzip;q=0', 'identity', ''])
+def test_refused_encodings_are_not_used(accept_encoding):
+    response = serve(LARGE, {'Accept-Encoding': accept_encoding})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_etag() == ('v1', False)
+    assert json.loads(response.get_data()) == LARGE
+
+
+def test_br_refused_falls_back_to_gzip():
+    response = serve(LARGE, {'Accept-Encoding': 'br;q=0, gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_small_body_is_not_compressed():
+    response = serve(SMALL, {'Accept-Encoding': 'gzip, br'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_etag() == ('v1', False)
+
+
+@pytest.mark.parametrize('etag', ['v1', 'v1-gzip', 'v1-br'])
+def test_matching_if_none_match_returns_304(etag):
+    with app.test_request_context(headers={'If-None-Match': f'"{etag}"'}):
+        response = not_modified('v1', 'private, no-cache')
+
+    assert response.status_code == 304
+    assert response.get_etag() == (etag, False)
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_other_version_is_not_a_match():
+    with app.test_request_context(headers={'If-None-Match': '"v0-gzip", "v2"'}):
+        assert not_modified('v1', 'private, no-cache') is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    topic_json = json.dumps({
+        "summary": "S" * COMPRESS_MIN_SIZE, "key_concepts": ["c"], "learning_objectives": ["o"],
+        "quizzes": [{"question": "q", "options": ["a", "b"], "correct_answer": "a", "explanation": "e"}],
+        "next_topics": ["n"], "estimated_duration": "20"
+    })
+    monkeypatch.setattr(routes.ai_service, 'llm', RunnableLambda(lambda _: AIMessage(content=topic_json)))
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app.test_client()
+
+
+def test_topic_etag_changes_after_customization(client):
+    token = client.post('/api/auth/register', json={
+        'username': 'etag', 'email': 'etag@example.com', 'password': 'secret'
+    }).get_json()['access_token']
+    auth = {'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip'}
+    topic_id = client.post('/api/topics', json={'title': 'Caching'}, headers=auth).get_json()['topic']['id']
+
+    first = client.get(f'/api/topics/{topic_id}', headers=auth)
+    etag = first.headers['ETag']
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert client.get(f'/api/topics/{topic_id}', headers=dict(auth, **{'If-None-Match': etag})).status_code == 304
+
+    assert client.put(f'/api/topics/{topic_id}', json={'description': 'mine'}, headers=auth).status_code == 200
+
+    changed = client.get(f'/api/topics/{topic_id}', headers=dict(auth, **{'If-None-Match': etag}))
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert json.loads(gzip.decompress(changed.get_data()))['topic']['description'] == 'mine'
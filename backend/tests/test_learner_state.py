@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+import pytest
+from models import LearnerState
+from ai_service import AIService
+
+
+@pytest.fixture
+def ai_service():
+    return AIService()
+
+
+def new_state(**values):
+    fields = dict(score_mean=0.0, score_trend=0.0, last_score=0.0, attempts=0,
+                  sessions=0, time_spent=0, last_activity=datetime.utcnow())
+    fields.update(values)
+    return LearnerState(user_id=1, topic_id=1, **fields)
+
+
+def test_first_quiz_sets_mean_without_trend():
+    state = new_state()
+    state.record_quiz(80.0)
+
+    assert state.score_mean == 80.0
+    assert state.score_trend == 0.0
+    assert state.attempts == 1
+
+
+def test_later_quizzes_update_exponentially_weighted_mean_and_trend():
+    state = new_state()
+    state.record_quiz(50.0)
+    state.record_quiz(100.0)
+
+    # mean moves 30% of the way to the new score; trend tracks the change in mean
+    assert state.score_mean == pytest.approx(65.0)
+    assert state.score_trend == pytest.approx(0.3 * 15.0)
+
+    state.record_quiz(65.0)
+    assert state.score_mean == pytest.approx(65.0)
+    assert state.score_trend == pytest.approx(4.5 + 0.3 * (0.0 - 4.5))
+    assert state.last_score == 65.0
+    assert state.attempts == 3
+
+
+def test_sessions_accumulate_time():
+    state = new_state()
+    state.record_session(12)
+    state.record_session(None)
+
+    assert state.sessions == 2
+    assert state.time_spent == 12
+
+
+def test_recency_weight_halves_every_half_life():
+    fresh = new_state().to_vector()
+    idle = new_state(last_activity=datetime.utcnow() - timedelta(days=LearnerState.RECENCY_HALF_LIFE_DAYS)).to_vector()
+
+    assert fresh['recency_weight'] == pytest.approx(1.0, abs=1e-3)
+    assert idle['recency_weight'] == pytest.approx(0.5, abs=1e-3)
+
+
+def test_no_attempts_starts_at_medium(ai_service):
+    assert ai_service._calculate_difficulty_adjustment(None, new_state().to_vector()) == "medium"
+    assert ai_service._calculate_difficulty_adjustment(None) == "medium"
+
+
+def test_recency_decay_pulls_estimate_towards_neutral(ai_service):
+    vector = new_state(score_mean=95.0, attempts=10).to_vector()
+    recent = ai_service._estimate_mastery(dict(vector, recency_weight=1.0))
+    stale = ai_service._estimate_mastery(dict(vector, recency_weight=0.1))
+
+    assert 60.0 < stale < recent < 95.0
+    assert ai_service._estimate_mastery(dict(vector, recency_weight=0.0)) == pytest.approx(60.0)
+
+
+def test_few_attempts_are_trusted_less(ai_service):
+    one = ai_service._estimate_mastery(dict(new_state(score_mean=20.0, attempts=1).to_vector(), recency_weight=1.0))
+    many = ai_service._estimate_mastery(dict(new_state(score_mean=20.0, attempts=20).to_vector(), recency_weight=1.0))
+
+    assert many < one < 60.0
+
+
+@pytest.mark.parametrize('mastery, tier', [
+    (100.0, "very hard"), (90.0, "very hard"), (89.9, "hard"),
+    (75.0, "hard"), (74.9, "medium"),
+    (55.0, "medium"), (54.9, "easy"),
+    (35.0, "easy"), (34.9, "very easy"), (0.0, "very easy"),
+])
+def test_difficulty_tier_boundaries(ai_service, monkeypatch, mastery, tier):
+    monkeypatch.setattr(ai_service, '_estimate_mastery', lambda state: mastery)
+
+    assert ai_service._calculate_difficulty_adjustment(None, {'attempts': 3}) == tier
@@ -0,0 +1,137 @@
+import os
+import pytest
+from ai_service import AdaptiveQuiz, TopicContent
+from output_parser import OutputParsingError, extract_json, parse_model_sections
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'corpus')
+
+FALLBACK = {
+    "summary": "placeholder summary",
+    "key_concepts": ["placeholder concept"],
+    "learning_objectives": ["placeholder objective"],
+    "quizzes": [{
+        "question": "placeholder?",
+        "options": ["A", "B"],
+        "correct_answer": "A",
+        "explanation": "placeholder"
+    }],
+    "next_topics": ["placeholder topic"],
+    "estimated_duration": "30"
+}
+
+
+def load(name):
+    with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def questions(content):
+    return [quiz['question'] for quiz in content['quizzes']]
+
+
+def test_fenced_output_is_parsed_without_fallback():
+    content, fallback_sections = parse_model_sections(load('fenced_topic.txt'), TopicContent, FALLBACK)
+
+    assert fallback_sections == []
+    assert content['key_concepts'] == ["Chlorophyll", "Light-dependent reactions", "Calvin cycle"]
+    assert len(content['quizzes']) == 2
+
+
+def test_brackets_in_surrounding_prose_are_skipped():
+    content, fallback_sections = parse_model_sections(load('prose_with_braces.txt'), TopicContent, FALLBACK)
+
+    assert fallback_sections == []
+    assert content['next_topics'] == ["Doubly linked lists"]
+
+
+def test_trailing_commas_are_repaired():
+    content, fallback_sections = parse_model_sections(load('trailing_commas.txt'), TopicContent, FALLBACK)
+
+    assert fallback_sections == []
+    assert content['key_concepts'] == ["Base case", "Recursive case", "Call stack"]
+    assert content['quizzes'][0]['options'] == ["A base case", "A loop", "A global variable"]
+    assert content['estimated_duration'] == "15"
+
+
+def test_quiz_cut_off_mid_answer_is_dropped():
+    content, fallback_sections = parse_model_sections(load('truncated_in_answer.txt'), TopicContent, FALLBACK)
+
+    assert fallback_sections == []
+    assert questions(content) == ["What is the capital of Germany?"]
+
+
+def test_truncated_list_keeps_only_complete_items():
+    data = extract_json(load('truncated_in_next_topics.txt'))
+
+    assert data['next_topics'] == ["Subqueries"]
+    assert 'estimated_duration' not in data
+
+    content, fallback_sections = parse_model_sections(load('truncated_in_next_topics.txt'), TopicContent, FALLBACK)
+    assert fallback_sections == ['estimated_duration']
+    assert content['estimated_duration'] == FALLBACK['estimated_duration']
+
+
+def test_truncated_summary_is_not_kept():
+    assert extract_json(load('truncated_in_summary.txt')) == {}
+
+    with pytest.raises(OutputParsingError):
+        parse_model_sections(load('truncated_in_summary.txt'), TopicContent, FALLBACK)
+
+
+def test_one_bad_quiz_is_dropped_and_the_rest_kept():
+    content, fallback_sections = parse_model_sections(load('one_bad_quiz.txt'), TopicContent, FALLBACK)
+
+    assert fallback_sections == []
+    assert questions(content) == ["What does my_list[-1] return?", "What does len([1, 2, 3]) return?"]
+
+
+def test_dict_literal_in_code_sample_does_not_hide_the_document():
+    text = load('unfenced_code_in_summary.txt')
+
+    assert 'summary' in extract_json(text, expect=dict)
+
+    content, fallback_sections = parse_model_sections(text, TopicContent, FALLBACK)
+    assert fallback_sections == []
+    assert "d = {}" in content['summary']
+
+
+def test_backticks_inside_a_fenced_string_do_not_end_the_fence():
+    content, fallback_sections = parse_model_sections(load('backticks_in_fenced_quiz.txt'), TopicContent, FALLBACK)
+
+    assert fallback_sections == []
+    assert questions(content) == ["What does ```print(len([1, 2]))``` output?"]
+    assert content['next_topics'] == ["Sets"]
+
+
+def test_invalid_section_falls_back_and_is_reported():
+    text = load('fenced_topic.txt').replace(
+        '"summary": "Photosynthesis is the process by which green plants convert light energy into chemical energy stored in glucose."',
+        '"summary": ["not", "a", "string"]'
+    )
+    content, fallback_sections = parse_model_sections(text, TopicContent, FALLBACK)
+
+    assert fallback_sections == ['summary']
+    assert content['summary'] == FALLBACK['summary']
+    assert len(content['quizzes']) == 2
+
+
+def test_adaptive_quiz_missing_questions_is_reported():
+    content, fallback_sections = parse_model_sections(
+        '{"estimated_time": "10"}',
+        AdaptiveQuiz,
+        {"questions": FALLBACK['quizzes'], "estimated_time": "10"}
+    )
+
+    assert fallback_sections == ['questions']
+    assert content['estimated_time'] == "10"
+
+
+def test_recommendation_array_is_found_after_bracketed_prose():
+    topics = extract_json(load('recommendations_prose.txt'), expect=list)
+
+    assert topics == ["Data Structures", "Algorithms", "Web APIs", "Testing in Python", "Databases"]
+
+
+def test_output_without_json_raises():
+    with pytest.raises(OutputParsingError):
+        extract_json(load('no_json.txt'))
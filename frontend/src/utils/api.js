@@ -46,11 +46,13 @@ export const topicAPI = {
   createTopic: (topicData) => api.post('/api/topics', topicData),
   getUserTopics: () => api.get('/api/topics'),
   getTopic: (topicId) => api.get(`/api/topics/${topicId}`),
+  updateTopic: (topicId, topicData) => api.put(`/api/topics/${topicId}`, topicData),
 };
 
 // Quiz API
 export const quizAPI = {
   submitQuiz: (quizData) => api.post('/api/quiz/submit', quizData),
+  createAdaptiveQuiz: (topicId) => api.post(`/api/quiz/adaptive/${topicId}`),
 };
 
 // Progress API